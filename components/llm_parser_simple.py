@@ -103,6 +103,65 @@ class OllamaLLMClient:
 class AdvancedWorkoutParser:
     """Parser Hiérarchique Ultra-Intelligent - Architecture Multi-Phase"""
     
+    # Patterns structurels avancés (compilés une seule fois, à la définition de la classe)
+    structural_patterns = {
+        'blocks': re.compile(r'(\d+)\s*blocs?'),
+        'repetitions': re.compile(r'(\d+)\s*répétitions?\s*de'),
+        'sets': re.compile(r'(\d+)\s*(?:sets?|séries?|set)\s*de'),
+        'intervals_x': re.compile(r'(\d+)\s*[x×]\s*(\d+)\s*(?:min|mn)'),  # "3 x 5 min"
+        'intervals_x_extended': re.compile(r'(\d+)\s*[x×]\s*(\d+)\s*(?:min|mn)\s+(\w+)'),  # "3 × 10 min threshold"
+        'nested_intervals': re.compile(r'\(([^)]+)\)'),
+        'each_block': re.compile(r'chaque\s+bloc\s+(?:consiste\s+en|comprend)'),
+        'then': re.compile(r'puis|ensuite|après'),
+        'duration': re.compile(r'(\d+)\s*(?:min|minutes?|mn)'),
+        'word_duration': re.compile(r'(dix|cinq|deux|trois|quatre|six|sept|huit|neuf|une?)\s*(?:minut|min)'),
+        'block_repetitions': re.compile(r'3\s*répétitions?\s*de\s*\(([^)]+)\)'),  # "3 répétitions de (...)"
+        'block_intervals': re.compile(r'(\d+)\s*min\s+vo2max.*?(\d+)\s*min\s+récupération'),
+        'set_intervals': re.compile(r'(\d+)\s*set\s*de\s*(\d+)\s*mn\s*(\w+)')  # "3 set de 5 mn fond"
+    }
+    
+    # Répétitions/intervalles en un seul passage (la forme "3 x 10 min threshold"
+    # est couverte par "3 x 10 min")
+    repetition_pattern = re.compile('|'.join([
+        structural_patterns['repetitions'].pattern,
+        structural_patterns['sets'].pattern,
+        structural_patterns['intervals_x'].pattern
+    ]))
+    
+    # Phases principales ("warmup" et "cooldown" couverts par "warm" et "cool")
+    phase_keywords_pattern = re.compile(r'(?P<warmup>échauff|warm)|(?P<cooldown>retour|cool)')
+    
+    # Patterns de la décomposition LLM "BLOC n: type - description" (parsing manuel)
+    decomposition_patterns = {
+        'bloc': re.compile(r'BLOC\s*(\d+)\s*:\s*([^-]+)-\s*(.+)'),
+        'duration': re.compile(r'(\d+)\s*min'),
+        'repetitions': re.compile(r'(\d+)\s*répétitions?\s*de'),
+        'work': re.compile(r'(\d+)\s*min\s*(vo2max|seuil|threshold)'),
+        'recovery': re.compile(r'(\d+)\s*min\s*(récupération|recovery)')
+    }
+    
+    # Nettoyage du JSON renvoyé par le LLM (espaces et retours à la ligne)
+    whitespace_pattern = re.compile(r'\s+')
+    
+    # Lettre répétée 3 fois ou plus ("fairrr", "velooo") : absente du français écrit
+    repeated_letters_pattern = re.compile(r'([^\W\d_])\1\1')
+    
+    # Mots-clés de contexte d'intensité, dans l'ordre de détection
+    intensity_keywords = {
+        'vo2max': ['vo2max', 'vo2', 'fond', 'max', 'intense'],     # Haute intensité
+        'threshold': ['seuil', 'threshold', 'effort'],               # Seuil
+        'endurance': ['endurance', 'aerobic', 'aérobie'],            # Endurance/aérobie
+        'recovery': ['récup', 'pause', 'pose', 'repos', 'recovery'], # Récupération
+        'warmup': ['échauff', 'warmup', 'warm', 'chaude'],           # Phases spéciales
+        'cooldown': ['retour', 'cooldown', 'cool', 'calme']
+    }
+    intensity_contexts = tuple(intensity_keywords)
+    intensity_keyword_map = {word: context for context, words in intensity_keywords.items() for word in words}
+    # Lookahead : détecte chaque mot-clé même s'il chevauche un autre
+    intensity_keywords_pattern = re.compile(
+        '(?=(' + '|'.join(map(re.escape, sorted(intensity_keyword_map, key=len, reverse=True))) + '))'
+    )
+    
     def __init__(self):
         # Initialiser le client Ollama (test de connexion différé)
         try:
@@ -128,20 +187,6 @@ class AdvancedWorkoutParser:
             'cooldown': {'intensity': 50, 'zone': 'Zone 1', 'description': 'Retour au calme'}
         }
         
-        # Patterns structurels avancés
-        self.structural_patterns = {
-            'blocks': r'(\d+)\s*blocs?',
-            'repetitions': r'(\d+)\s*répétitions?\s*de',
-            'sets': r'(\d+)\s*(?:sets?|séries?|set)\s*de',
-            'intervals_x': r'(\d+)\s*[x×]\s*(\d+)\s*(?:min|mn)',  # "3 x 5 min"
-            'intervals_x_extended': r'(\d+)\s*[x×]\s*(\d+)\s*(?:min|mn)\s+(\w+)',  # "3 × 10 min threshold"
-            'nested_intervals': r'\(([^)]+)\)',
-            'each_block': r'chaque\s+bloc\s+(?:consiste\s+en|comprend)',
-            'then': r'puis|ensuite|après',
-            'duration': r'(\d+)\s*(?:min|minutes?|mn)',
-            'word_duration': r'(dix|cinq|deux|trois|quatre|six|sept|huit|neuf|une?)\s*(?:minut|min)'
-        }
-        
         self.word_to_number = {
             'un': 1, 'une': 1, 'deux': 2, 'trois': 3, 'quatre': 4, 'cinq': 5,
             'six': 6, 'sept': 7, 'huit': 8, 'neuf': 9, 'dix': 10
@@ -151,6 +196,10 @@ class AdvancedWorkoutParser:
         """Parse complet multi-phase ultra-intelligent"""
         print("🧠 === PARSING HIÉRARCHIQUE MULTI-PHASE ===")
         
+        # Phase 0: Rejet immédiat des requêtes illisibles (évite les appels LLM)
+        if self._is_unrecognizable(query):
+            raise ValueError(f"❌ Langage non reconnu dans: '{query}'")
+        
         # Phase 1: Analyse structurelle
         structure_analysis = self._analyze_structure(query)
         print(f"📊 Structure détectée: {structure_analysis}")
@@ -161,6 +210,15 @@ class AdvancedWorkoutParser:
         else:
             return self._parse_simple_structure(query)
     
+    def _is_unrecognizable(self, query: str) -> bool:
+        """Pré-filtre O(n) : majorité de mots aux lettres étirées"""
+        words = query.lower().split()
+        if len(words) < 2:
+            return False
+        
+        garbled = sum(1 for word in words if self.repeated_letters_pattern.search(word))
+        return garbled / len(words) > 0.5
+    
     def _analyze_structure(self, query: str) -> Dict:
         """Phase 1: Analyse structurelle intelligente"""
         analysis = {
@@ -176,34 +234,29 @@ class AdvancedWorkoutParser:
         query_lower = query.lower()
         
         # Détection blocs
-        block_match = re.search(self.structural_patterns['blocks'], query_lower)
+        block_match = self.structural_patterns['blocks'].search(query_lower)
         if block_match:
             analysis['has_blocks'] = True
             analysis['block_count'] = int(block_match.group(1))
             analysis['complexity_score'] += 3
         
         # Détection structures imbriquées
-        if re.search(self.structural_patterns['nested_intervals'], query):
+        if self.structural_patterns['nested_intervals'].search(query):
             analysis['has_nested_intervals'] = True
             analysis['complexity_score'] += 2
         
         # Détection répétitions/intervalles
-        if re.search(self.structural_patterns['repetitions'], query_lower) or \
-           re.search(self.structural_patterns['sets'], query_lower) or \
-           re.search(self.structural_patterns['intervals_x'], query_lower) or \
-           re.search(self.structural_patterns['intervals_x_extended'], query_lower):
+        if self.repetition_pattern.search(query_lower):
             analysis['has_repetitions'] = True
             analysis['complexity_score'] += 2
         
         # Détection "chaque bloc"
-        if re.search(self.structural_patterns['each_block'], query_lower):
+        if self.structural_patterns['each_block'].search(query_lower):
             analysis['complexity_score'] += 2
         
         # Phases principales
-        if any(word in query_lower for word in ['échauff', 'warmup', 'warm']):
-            analysis['phases'].append('warmup')
-        if any(word in query_lower for word in ['retour', 'cooldown', 'cool']):
-            analysis['phases'].append('cooldown')
+        phases = {match.lastgroup for match in self.phase_keywords_pattern.finditer(query_lower)}
+        analysis['phases'].extend(phase for phase in ('warmup', 'cooldown') if phase in phases)
         
         # Détermination complexité
         analysis['is_complex'] = analysis['complexity_score'] >= 3
@@ -319,8 +372,7 @@ Règles:
                         json_str = response[json_start:json_end]
                         
                         # Nettoyage du JSON
-                        json_str = json_str.replace('\n', ' ')
-                        json_str = re.sub(r'\s+', ' ', json_str)
+                        json_str = self.whitespace_pattern.sub(' ', json_str)
                         json_str = json_str.replace('" }', '"}')
                         json_str = json_str.replace('" ]', '"]')
                         
@@ -352,8 +404,7 @@ Règles:
         metadata = {'source': 'llm_manual_parsing', 'original_query': original_query}
         
         # Extraction des blocs
-        bloc_pattern = r'BLOC\s*(\d+)\s*:\s*([^-]+)-\s*(.+)'
-        blocs = re.findall(bloc_pattern, decomposition)
+        blocs = self.decomposition_patterns['bloc'].findall(decomposition)
         
         for bloc_num, bloc_type, bloc_description in blocs:
             bloc_type = bloc_type.strip().lower()
@@ -361,7 +412,7 @@ Règles:
             
             # Parsing de chaque type de bloc
             if 'échauffement' in bloc_type or 'warmup' in bloc_type:
-                duration_match = re.search(r'(\d+)\s*min', description)
+                duration_match = self.decomposition_patterns['duration'].search(description)
                 duration = int(duration_match.group(1)) if duration_match else 10
                 
                 workout_steps.append({
@@ -373,9 +424,9 @@ Règles:
                 
             elif 'intervalles' in bloc_type or 'intervals' in bloc_type:
                 # Parsing complexe des intervalles
-                rep_match = re.search(r'(\d+)\s*répétitions?\s*de', description)
-                work_match = re.search(r'(\d+)\s*min\s*(vo2max|seuil|threshold)', description)
-                recovery_match = re.search(r'(\d+)\s*min\s*(récupération|recovery)', description)
+                rep_match = self.decomposition_patterns['repetitions'].search(description)
+                work_match = self.decomposition_patterns['work'].search(description)
+                recovery_match = self.decomposition_patterns['recovery'].search(description)
                 
                 if rep_match and work_match:
                     repetitions = int(rep_match.group(1))
@@ -410,7 +461,7 @@ Règles:
                             })
                             
             elif 'endurance' in bloc_type:
-                duration_match = re.search(r'(\d+)\s*min', description)
+                duration_match = self.decomposition_patterns['duration'].search(description)
                 duration = int(duration_match.group(1)) if duration_match else 5
                 
                 workout_steps.append({
@@ -421,7 +472,7 @@ Règles:
                 })
                 
             elif 'retour' in bloc_type or 'cooldown' in bloc_type:
-                duration_match = re.search(r'(\d+)\s*min', description)
+                duration_match = self.decomposition_patterns['duration'].search(description)
                 duration = int(duration_match.group(1)) if duration_match else 10
                 
                 workout_steps.append({
@@ -464,10 +515,11 @@ Règles:
             'structures': [],
             'phases': {'warmup': None, 'cooldown': None}
         }
+        query_lower = query.lower()
         
         # Extraction durées (numériques + textuelles)
         for pattern in [self.structural_patterns['duration'], self.structural_patterns['word_duration']]:
-            matches = re.findall(pattern, query.lower())
+            matches = pattern.findall(query_lower)
             for match in matches:
                 if match.isdigit():
                     components['durations'].append(int(match))
@@ -480,11 +532,11 @@ Règles:
         # Extraction répétitions/sets
         rep_patterns = [self.structural_patterns['repetitions'], self.structural_patterns['sets']]
         for pattern in rep_patterns:
-            matches = re.findall(pattern, query.lower())
+            matches = pattern.findall(query_lower)
             components['repetitions'].extend([int(m) for m in matches])
         
         # Extraction structures imbriquées
-        nested_matches = re.findall(self.structural_patterns['nested_intervals'], query)
+        nested_matches = self.structural_patterns['nested_intervals'].findall(query)
         for match in nested_matches:
             components['structures'].append(match)
         
@@ -492,33 +544,11 @@ Règles:
     
     def _detect_intensities_with_context(self, query: str) -> List[str]:
         """Détection intelligente avec analyse contextuelle"""
-        detected = []
-        query_lower = query.lower()
-        
-        # Contexte haute intensité  
-        if any(word in query_lower for word in ['vo2max', 'vo2', 'fond', 'max', 'intense']):
-            detected.append('vo2max')
-        
-        # Contexte seuil
-        if any(word in query_lower for word in ['seuil', 'threshold', 'effort']):
-            detected.append('threshold')
+        # Un seul passage sur la requête pour tous les mots-clés
+        found = {self.intensity_keyword_map[keyword]
+                 for keyword in self.intensity_keywords_pattern.findall(query.lower())}
         
-        # Contexte endurance/aérobie
-        if any(word in query_lower for word in ['endurance', 'aerobic', 'aérobie']):
-            detected.append('endurance')
-        
-        # Contexte récupération
-        if any(word in query_lower for word in ['récup', 'pause', 'pose', 'repos', 'recovery']):
-            detected.append('recovery')
-        
-        # Phases spéciales
-        if any(word in query_lower for word in ['échauff', 'warmup', 'warm', 'chaude']):
-            detected.append('warmup')
-        
-        if any(word in query_lower for word in ['retour', 'cooldown', 'cool', 'calme']):
-            detected.append('cooldown')
-        
-        return detected
+        return [context for context in self.intensity_contexts if context in found]
     
     def _compose_block_structure(self, query: str, components: Dict, structure_analysis: Dict) -> Tuple[List[Dict], Dict]:
         """Composition intelligente structure en blocs"""
@@ -545,9 +575,10 @@ Règles:
         block_count = structure_analysis['block_count']
         
         # Analyse de la structure de bloc via regex avancée
-        if re.search(r'3\s*répétitions?\s*de\s*\(([^)]+)\)', query.lower()):
+        query_lower = query.lower()
+        if self.structural_patterns['block_repetitions'].search(query_lower):
             # Structure détectée: "3 répétitions de (2 min VO2max, 1 min récupération)"
-            interval_match = re.search(r'(\d+)\s*min\s+vo2max.*?(\d+)\s*min\s+récupération', query.lower())
+            interval_match = self.structural_patterns['block_intervals'].search(query_lower)
             if interval_match:
                 work_duration = int(interval_match.group(1))
                 recovery_duration = int(interval_match.group(2))
@@ -602,16 +633,17 @@ Règles:
         """Composition structure linéaire intelligente"""
         workout_steps = []
         original_query = components.get('_original_query', '') or ""
+        query_lower = original_query.lower()
         
         # === DÉTECTION PATTERNS SPÉCIAUX ===
         
         # Pattern "X x Y min intensity" (ex: "3 x 5 min seuil")
-        interval_x_match = re.search(self.structural_patterns['intervals_x_extended'], original_query.lower())
+        interval_x_match = self.structural_patterns['intervals_x_extended'].search(query_lower)
         if not interval_x_match:
-            interval_x_match = re.search(self.structural_patterns['intervals_x'], original_query.lower())
+            interval_x_match = self.structural_patterns['intervals_x'].search(query_lower)
         
         # Pattern "X set de Y mn intensity"
-        set_pattern_match = re.search(r'(\d+)\s*set\s*de\s*(\d+)\s*mn\s*(\w+)', original_query.lower())
+        set_pattern_match = self.structural_patterns['set_intervals'].search(query_lower)
         
         if interval_x_match:
             # Parsing "3 x 5 min seuil" ou "3 × 10 min threshold"
@@ -675,7 +707,7 @@ Règles:
             duration = int(set_pattern_match.group(2))
             
             # Détecte l'intensité depuis "fond" ou autre
-            main_intensity = 'vo2max' if any(word in original_query.lower() for word in ['fond', 'max']) else 'threshold'
+            main_intensity = 'vo2max' if any(word in query_lower for word in ['fond', 'max']) else 'threshold'
             
             # Phases
             if 'warmup' in components['intensities']:
@@ -10,12 +10,15 @@ import pandas as pd
 import os
 import sys
 import time
+from collections import defaultdict
 
 # Import du parser intelligent
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 components_path = os.path.join(parent_dir, 'components')
-sys.path.insert(0, components_path)
+# Streamlit réexécute ce script à chaque interaction : n'ajouter le chemin qu'une fois
+if components_path not in sys.path:
+    sys.path.insert(0, components_path)
 
 try:
     from llm_parser_simple import IntelligentWorkoutParser, WorkoutEntity
@@ -63,6 +66,15 @@ st.markdown("""
 
 # Interface sans sidebar - plus épurée
 
+@st.cache_data(show_spinner=False, ttl=30)
+def fetch_ollama_models():
+    """Modèles Ollama (/api/tags), rafraîchis au plus toutes les 30 secondes"""
+    import requests
+    response = requests.get("http://localhost:11434/api/tags", timeout=2)
+    if response.status_code != 200:
+        return None
+    return response.json().get("models", [])
+
 def show_system_info():
     """Affiche les informations système pour Mac M3"""
     with st.expander("🖥️ Informations Système", expanded=False):
@@ -82,16 +94,14 @@ def show_system_info():
             
         # Vérification de la connexion Ollama
         try:
-            import requests
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            if response.status_code == 200:
+            models = fetch_ollama_models()
+            if models is not None:
                 st.success("✅ Ollama connecté et fonctionnel")
-                models = response.json().get("models", [])
                 if models:
                     st.markdown("**Modèles disponibles:**")
                     for model in models:
                         model_name = model.get("name", "Unknown")
-                        if "llama3.2:3b" in model_name:
+                        if model_name == "llama3.2:3b":
                             st.markdown(f"- ✅ {model_name}")
                         else:
                             st.markdown(f"- {model_name}")
@@ -100,6 +110,41 @@ def show_system_info():
         except:
             st.warning("⚠️ Impossible de vérifier Ollama")
 
+@st.cache_resource(show_spinner=False)
+def get_parser():
+    """Parser partagé entre les reruns Streamlit (construit une seule fois)"""
+    return IntelligentWorkoutParser()
+
+# Sources produites par le parsing LLM des structures complexes
+LLM_SOURCES = {'llm_hierarchical', 'llm_manual_parsing'}
+
+class _UncachedParse(Exception):
+    """Résultat de secours (LLM indisponible) transmis hors du cache"""
+    
+    def __init__(self, result):
+        super().__init__("résultat de secours non mis en cache")
+        self.result = result
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _parse_workout_memo(query):
+    """Parsing mémorisé par requête (les erreurs ne sont pas mises en cache)"""
+    parser = get_parser()
+    workout_steps, metadata = parser.parse_workout(query)
+    
+    # Structure complexe sans réponse LLM : le fallback sémantique n'est pas mis
+    # en cache, la requête sera retentée avec Ollama au prochain envoi
+    if metadata.get('source') not in LLM_SOURCES and parser._analyze_structure(query)['is_complex']:
+        raise _UncachedParse((workout_steps, metadata))
+    
+    return workout_steps, metadata
+
+def parse_workout_cached(query):
+    """Résultat du parsing, mémorisé sauf s'il s'agit d'un fallback sans LLM"""
+    try:
+        return _parse_workout_memo(query)
+    except _UncachedParse as fallback:
+        return fallback.result
+
 def format_time(minutes):
     """Convertit les minutes en format HH:MM:SS"""
     hours = minutes // 60
@@ -148,7 +193,8 @@ def generate_detailed_steps(workout_steps, critical_power):
 
 def create_zwift_workout(workout_steps, workout_name="Vekta Custom Workout"):
     """Génère un fichier de workout Zwift au format ZWO"""
-    zwift_xml = f'''<?xml version="1.0" encoding="UTF-8"?>
+    # Morceaux accumulés dans une liste puis assemblés une seule fois
+    lines = [f'''<?xml version="1.0" encoding="UTF-8"?>
 <workout_file>
     <author>Vekta V2</author>
     <name>{workout_name}</name>
@@ -159,22 +205,23 @@ def create_zwift_workout(workout_steps, workout_name="Vekta Custom Workout"):
         <tag name="Vekta"/>
     </tags>
     <workout>
-'''
+''']
     
     for step in workout_steps:
         duration_seconds = step['duration'] * 60
         power_percent = step['power_percent'] / 100  # Zwift utilise 0.0-1.0
+        description = step['description'].lower()
         
         # Détermine le type d'effort
-        if 'récup' in step['description'].lower() or 'recovery' in step['description'].lower():
-            zwift_xml += f'        <Ramp Duration="{duration_seconds}" PowerLow="{power_percent:.2f}" PowerHigh="{power_percent:.2f}"/>\n'
+        if 'récup' in description or 'recovery' in description:
+            lines.append(f'        <Ramp Duration="{duration_seconds}" PowerLow="{power_percent:.2f}" PowerHigh="{power_percent:.2f}"/>\n')
         else:
-            zwift_xml += f'        <SteadyState Duration="{duration_seconds}" Power="{power_percent:.2f}"/>\n'
+            lines.append(f'        <SteadyState Duration="{duration_seconds}" Power="{power_percent:.2f}"/>\n')
     
-    zwift_xml += '''    </workout>
-</workout_file>'''
+    lines.append('''    </workout>
+</workout_file>''')
     
-    return zwift_xml
+    return "".join(lines)
 
 def get_power_zone_color(zone):
     """Couleurs des zones de puissance - palette cycliste professionnelle"""
@@ -351,26 +398,12 @@ def calculate_session_metrics(workout_steps, critical_power):
     work_steps = [s for s in workout_steps if 'récup' not in s['description'].lower()]
     if work_steps:
         # Calcule le temps passé dans chaque zone
-        zone_times = {}
+        zone_times = defaultdict(int)
         for step in work_steps:
-            power_percent = step['power_percent']
-            duration = step['duration']
-            
-            if power_percent >= 105:
-                zone = "vo2max"
-            elif power_percent >= 90:
-                zone = "threshold"
-            elif power_percent >= 75:
-                zone = "tempo"
-            elif power_percent >= 55:
-                zone = "aerobic"
-            else:
-                zone = "recovery"
-                
-            zone_times[zone] = zone_times.get(zone, 0) + duration
+            zone_times[get_zone_name(step['power_percent'])] += step['duration']
         
         # Zone dominante = celle avec le plus de temps
-        dominant_zone = max(zone_times.keys(), key=lambda k: zone_times[k]) if zone_times else "aerobic"
+        dominant_zone = max(zone_times, key=zone_times.get)
         training_stimulus = dominant_zone
     else:
         training_stimulus = "recovery"
@@ -461,16 +494,16 @@ with col2:
 # Traitement de la requête
 if submit and query:
     try:
-        # Initialiser le parser hiérarchique ultra-intelligent
-        parser = IntelligentWorkoutParser()
-        
         with st.spinner("🧠 Parsing Hiérarchique Multi-Phase en cours..."):
-            start_time = time.time()
+            start_time = time.perf_counter()
             
-            # Parse complet avec nouvelle architecture
-            workout_steps, metadata = parser.parse_workout(query)
+            # Parse complet avec nouvelle architecture (mémorisé par requête ;
+            # espaces normalisés pour qu'une saisie reformatée réutilise le cache).
+            # Pas de TTL : seuls les résultats déterministes ou LLM réussis sont
+            # mis en cache, les fallbacks sans Ollama sont recalculés à chaque envoi
+            workout_steps, metadata = parse_workout_cached(" ".join(query.split()))
             
-            generation_time = time.time() - start_time
+            generation_time = time.perf_counter() - start_time
     
     except Exception as e:
         if "Ollama" in str(e):
@@ -592,19 +625,19 @@ if submit and query:
                 interval_count = 0
                 
                 for step_detail in detailed_steps:
-                    description = step_detail['description']
+                    description = step_detail['description'].lower()
                     step_type = None
                     
                     # Détermine le type d'étape selon la description
-                    if 'échauffement' in description.lower() or 'warmup' in description.lower():
+                    if 'échauffement' in description or 'warmup' in description:
                         step_type = 'warmup'
-                    elif 'bloc' in description.lower() and ('interval' in description.lower() or 'vo2max' in description.lower()):
+                    elif 'bloc' in description and ('interval' in description or 'vo2max' in description):
                         step_type = 'block_interval'
-                    elif 'récup' in description.lower() and 'bloc' not in description.lower():
+                    elif 'récup' in description and 'bloc' not in description:
                         step_type = 'recovery'
-                    elif 'endurance' in description.lower() and 'bloc' in description.lower():
+                    elif 'endurance' in description and 'bloc' in description:
                         step_type = 'block_endurance'
-                    elif 'retour' in description.lower() or 'cooldown' in description.lower():
+                    elif 'retour' in description or 'cooldown' in description:
                         step_type = 'cooldown'
                     else:
                         step_type = 'active'
@@ -641,7 +674,10 @@ if submit and query:
                 pattern = metadata.get('pattern', '')
                 
                 # Détecte le nombre de répétitions
-                reps_count = len([s for s in workout_steps if 'set' in s.get('description', '').lower() or 'interval' in s.get('description', '').lower()])
+                reps_count = sum(
+                    1 for description in (s.get('description', '').lower() for s in workout_steps)
+                    if 'set' in description or 'interval' in description
+                )
                 if reps_count > 1:
                     steps_text += f"• {reps_count} x\n"
                 
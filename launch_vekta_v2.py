@@ -4,11 +4,13 @@ Lanceur Vekta V2 - Intelligence Architecture avec Auto-Démarrage Ollama
 Architecture LLM + Validation Stricte + Auto-Configuration Ollama
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
 import time
 import signal
+import shutil
 import threading
 import requests
 from pathlib import Path
@@ -17,6 +19,9 @@ from pathlib import Path
 ollama_process = None
 streamlit_process = None
 
+# Événement d'arrêt partagé entre le gestionnaire de signaux et la surveillance
+stop_event = threading.Event()
+
 def check_ollama_installed():
     """Vérifie si Ollama est installé"""
     try:
@@ -58,16 +63,26 @@ def start_ollama():
         env['OLLAMA_KEEP_ALIVE'] = '5m'  # Garde le modèle en mémoire 5 minutes
         env['OLLAMA_NUM_PARALLEL'] = '1'  # Une seule requête à la fois pour économiser la mémoire
         
+        # Chemin absolu + close_fds=False : CPython peut alors utiliser
+        # posix_spawn() au lieu de fork()+exec() (lancement plus rapide sur macOS).
+        # Les sorties ne sont jamais lues : DEVNULL évite aussi de remplir un pipe.
+        ollama_executable = shutil.which('ollama') or 'ollama'
         ollama_process = subprocess.Popen(
-            ['ollama', 'serve'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+            [ollama_executable, 'serve'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=False,
             env=env
         )
         
-        # Attendre que Ollama soit prêt (max 30 secondes)
-        for i in range(30):
+        # Attendre que Ollama soit prêt (max 30 secondes), sondage toutes les 250 ms
+        print("⏳ Attente d'Ollama...")
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if ollama_process.poll() is not None:
+                print(f"❌ Ollama s'est arrêté au démarrage (code: {ollama_process.returncode})")
+                return False
+            
             try:
                 response = requests.get("http://localhost:11434/api/tags", timeout=2)
                 if response.status_code == 200:
@@ -76,8 +91,7 @@ def start_ollama():
             except requests.exceptions.RequestException:
                 pass
             
-            print(f"⏳ Attente d'Ollama... ({i+1}/30)")
-            time.sleep(1)
+            time.sleep(0.25)
         
         print("❌ Timeout: Ollama n'a pas pu démarrer")
         return False
@@ -97,9 +111,9 @@ def pull_optimal_model():
         response = requests.get("http://localhost:11434/api/tags", timeout=10)
         if response.status_code == 200:
             models = response.json().get("models", [])
-            model_names = [model.get("name", "") for model in models]
+            model_names = {model.get("name", "") for model in models}
             
-            if any(optimal_model in name for name in model_names):
+            if optimal_model in model_names:
                 print(f"✅ Modèle {optimal_model} déjà disponible")
                 return True
         
@@ -129,6 +143,27 @@ def pull_optimal_model():
         print(f"❌ Erreur: {e}")
         return False
 
+def warm_up_model():
+    """Précharge le modèle en mémoire pour que la première requête soit rapide"""
+    print("🔥 Préchargement du modèle llama3.2:3b...")
+    
+    try:
+        # Requête sans prompt : Ollama charge le modèle sans générer de texte
+        start_time = time.perf_counter()
+        response = requests.post(
+            "http://localhost:11434/api/generate",
+            json={"model": "llama3.2:3b", "keep_alive": "5m"},
+            timeout=120
+        )
+        if response.status_code == 200:
+            print(f"✅ Modèle chargé en mémoire ({time.perf_counter() - start_time:.1f}s)")
+            return True
+        print(f"⚠️  Préchargement impossible (code: {response.status_code})")
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️  Préchargement impossible: {e}")
+    
+    return False
+
 def setup_ollama():
     """Configuration d'Ollama avec modèle optimal pour Mac M3"""
     print("🧠 === CONFIGURATION OLLAMA POUR MAC M3 ===")
@@ -147,6 +182,9 @@ def setup_ollama():
     if not pull_optimal_model():
         print("⚠️  Impossible de télécharger le modèle optimal")
         print("💡 L'application fonctionnera, mais le modèle sera téléchargé au premier usage")
+    else:
+        # 5. Précharger le modèle avant la première requête utilisateur
+        warm_up_model()
     
     print("✅ Ollama configuré et prêt avec modèle Mac M3")
     return True
@@ -164,11 +202,11 @@ def check_dependencies():
     
     missing_packages = []
     
+    # find_spec vérifie la présence sans exécuter le module (streamlit, pandas...)
     for package in required_packages:
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"  ✅ {package}")
-        except ImportError:
+        else:
             print(f"  ❌ {package} - MANQUANT")
             missing_packages.append(package)
     
@@ -204,12 +242,31 @@ def launch_streamlit_v2():
         '--server.address', '127.0.0.1'
     ]
     
+    # Surveillance des fichiers (rechargement à chaud) réservée au développement
+    if os.environ.get('VEKTA_DEV') != '1':
+        cmd += ['--server.fileWatcherType', 'none']
+    
     try:
         print("🌐 Interface disponible sur: http://localhost:8502")
-        streamlit_process = subprocess.run(cmd)
+        streamlit_process = subprocess.Popen(cmd, close_fds=False)
+        
+        # Surveille Streamlit et Ollama ; le thread principal attend simplement l'arrêt
+        threading.Thread(target=monitor_processes, daemon=True).start()
+        stop_event.wait()
+        print("\n⏹️  Arrêt de Vekta V2")
     except KeyboardInterrupt:
         print("\n⏹️  Arrêt de Vekta V2")
 
+def monitor_processes():
+    """Déclenche l'arrêt dès que Streamlit ou Ollama se termine"""
+    while not stop_event.is_set():
+        for name, process in (("Streamlit", streamlit_process), ("Ollama", ollama_process)):
+            if process is not None and process.poll() is not None:
+                print(f"⚠️  {name} s'est arrêté (code: {process.returncode})")
+                stop_event.set()
+                return
+        stop_event.wait(1)
+
 def cleanup_processes():
     """Nettoie les processus avant de quitter"""
     global ollama_process, streamlit_process
@@ -219,6 +276,10 @@ def cleanup_processes():
     if streamlit_process and streamlit_process.poll() is None:
         print("⏹️  Arrêt de Streamlit...")
         streamlit_process.terminate()
+        try:
+            streamlit_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            streamlit_process.kill()
     
     if ollama_process and ollama_process.poll() is None:
         print("⏹️  Arrêt d'Ollama...")
@@ -230,8 +291,10 @@ def cleanup_processes():
 
 def signal_handler(signum, frame):
     """Gestionnaire de signaux pour un arrêt propre"""
-    cleanup_processes()
-    sys.exit(0)
+    if streamlit_process is None:
+        # Interface pas encore lancée : arrêt immédiat (nettoyage dans main)
+        sys.exit(0)
+    stop_event.set()
 
 def check_system_resources():
     """Vérifie les ressources système pour Mac M3"""